@@ -1 +1 @@
-from p3270.p3270 import S3270, P3270Client, Config, StatusMessage
+from p3270.p3270 import S3270, P3270Client, Config, StatusMessage, enableFileLogging, disableFileLogging
@@ -1,14 +1,117 @@
+import asyncio
+import atexit
+import concurrent.futures
 import os
+import queue
 import re
 import subprocess
+import sys
+import threading
 import logging
+import logging.handlers
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """ BufferedFileHandler: a FileHandler which does not flush the file after each record
+        Records are written through a buffer of 'bufferSize' bytes, which is
+        flushed when it is full, and when the handler is flushed or closed.
+        Behind a FlushingQueueListener, it is flushed as soon as no record is waiting.
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False, bufferSize=65536):
+        self.bufferSize = bufferSize
+        super().__init__(filename, mode, encoding, delay)
+
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.bufferSize, encoding=self.encoding)
+
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """ FlushingQueueListener: a QueueListener which flushes its handlers when its queue is empty
+        Records logged in bursts are written together, and none is left in a
+        buffer while the application is idle, hangs or gets killed.
+    """
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+# Nothing is logged unless the application configures logging, or calls enableFileLogging
+logger.addHandler(logging.NullHandler())
 formatter = logging.Formatter('%(levelname)s: %(name)s - %(asctime)s - %(process)d: %(message)s')
-fileHandler = logging.FileHandler('p3270.log')
-fileHandler.setFormatter(formatter)
-logger.addHandler(fileHandler)
+# (QueueHandler, QueueListener) installed by enableFileLogging
+_fileLogging = None
+
+
+def enableFileLogging(path='p3270.log', level=logging.INFO):
+    """ Write the log messages of the library to a file, from the specified level
+        Records are queued, and written to the file by a background thread,
+        which flushes the file whenever it has written all the queued records.
+        A previous call is replaced.
+    """
+    global _fileLogging
+    disableFileLogging()
+    fileHandler = BufferedFileHandler(path)
+    fileHandler.setFormatter(formatter)
+    logQueue = queue.Queue(-1)
+    listener = FlushingQueueListener(logQueue, fileHandler, respect_handler_level=True)
+    listener.start()
+    queueHandler = logging.handlers.QueueHandler(logQueue)
+    logger.addHandler(queueHandler)
+    logger.setLevel(level)
+    _fileLogging = queueHandler, listener
+
+
+def disableFileLogging():
+    """ Stop writing the log messages to a file, after writing the pending ones
+    """
+    global _fileLogging
+    if _fileLogging is None:
+        return
+    queueHandler, listener = _fileLogging
+    _fileLogging = None
+    logger.removeHandler(queueHandler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+atexit.register(disableFileLogging)
+
+
+# Size requested for the pipe carrying the s3270 replies
+_replyPipeSize = 1 << 20
+
+
+def _enlargePipe(pipe, size):
+    """ Ask the kernel for a larger pipe buffer (Linux only), so that large
+        replies are read in fewer system calls.
+        Failures (e.g. a size above /proc/sys/fs/pipe-max-size) are ignored:
+        the default size works, only with more reads.
+    """
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return
+    try:
+        # F_SETPIPE_SZ is only exposed by Python 3.10+
+        fcntl.fcntl(pipe.fileno(), getattr(fcntl, 'F_SETPIPE_SZ', 1031), size)
+    except (OSError, ValueError):
+        pass
 
 
 class InvalidConfiguration(Exception):
@@ -19,29 +122,157 @@ class S3270():
     """ S3270: represents the S3270 command and its arguments/methods
         This the interface to the 's3270' executable
     """
+    __slots__ = ('args', 'encoding', 'subpro', 'buffer', 'statusMsg', 'lastConnectionState', '_stdinFd',
+                 '_pending', '_lock', '_executor')
     numOfInstances = 0
+    # Idle s3270 processes left by ended sessions, by command line arguments
+    _pool = {}
+    _poolLock = threading.Lock()
+    # Maximum number of idle processes kept for the same arguments
+    maxIdle = 4
+    # Maximum size of the commands written before their replies are read.
+    # s3270 stops reading its input when nobody reads its replies: a window
+    # small enough for any pipe buffer is always written without blocking.
+    windowSize = 16384
+    # The return message ('ok' or 'error') is the last line of every reply
+    returnPattern = re.compile(b'^(?:ok|error)\r?\n', re.MULTILINE)
+    # Constant commands (no argument, PF and PA keys), encoded once. They are
+    # plain ASCII, which all the supported encodings have in common.
+    _constantCommands = (('Enter', 'Tab', 'BackTab', 'BackSpace', 'Up', 'Down', 'Left', 'Right',
+                          'Home', 'Clear', 'Delete', 'DeleteField', 'DeleteWord', 'Erase',
+                          'NoOpCommand', 'Quit', 'Disconnect')
+                         + tuple('PF({})'.format(n) for n in range(1, 25))
+                         + tuple('PA({})'.format(n) for n in range(1, 4)))
+    _encodedCommands = {cmd: (cmd + '\n').encode('latin1') for cmd in _constantCommands}
 
     def __init__(self, args, encoding='latin1'):
         self.args = args
         self.encoding = encoding
-        logger.debug('Calling s3270 with the following args: ', self.args)
+        logger.debug('Calling s3270 with the following args: %s', self.args)
         self.subpro = subprocess.Popen(self.args,
                                        stdout=subprocess.PIPE,
                                        stdin=subprocess.PIPE,
                                        stderr=subprocess.PIPE)
+        # Commands are written to the pipe directly, bypassing the stdin buffer
+        self._stdinFd = self.subpro.stdin.fileno()
+        _enlargePipe(self.subpro.stdout, _replyPipeSize)
         self.buffer = None
         self.statusMsg = None
+        # Connection state of the last status message
+        self.lastConnectionState = False
+        # Bytes read from s3270 but not consumed yet (the replies of a batch)
+        self._pending = bytearray()
+        # Serializes the pipe accesses of concurrent calls
+        self._lock = threading.Lock()
+        # Asynchronous calls run one at a time, in the order they are made
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    @classmethod
+    def acquire(cls, args, encoding='latin1'):
+        """ Get an idle s3270 process started with the same arguments,
+            or start a new one if there is none
+        """
+        with cls._poolLock:
+            idle = cls._pool.get(tuple(args), [])
+            while idle:
+                s3270 = idle.pop()
+                # Processes which ended while idle are dropped
+                if s3270.subpro.poll() is None:
+                    return s3270
+        return cls(args, encoding)
+
+    def release(self):
+        """ Keep the s3270 process idle, for reuse by 'acquire'
+            It should be disconnected from the host first.
+            If 'maxIdle' processes are already idle, the emulator script is ended instead.
+            Returns False if the process is already idle.
+        """
+        with self._poolLock:
+            idle = self._pool.setdefault(tuple(self.args), [])
+            if self in idle:
+                logger.error("The s3270 process is already released")
+                return False
+            if len(idle) < self.maxIdle:
+                idle.append(self)
+                return True
+        return self.do('Quit')
+
+    @classmethod
+    def closeIdle(cls):
+        """ End all the idle s3270 processes
+            It is called at exit, and may be called at any time to free them.
+        """
+        with cls._poolLock:
+            idle = [s3270 for processes in cls._pool.values() for s3270 in processes]
+            cls._pool.clear()
+        for s3270 in idle:
+            try:
+                s3270.do('Quit')
+            except OSError:
+                # The process has already ended
+                pass
 
     def do(self, cmd):
         """ Execute the command represented by the specified string
         """
-        self.cmd = cmd.encode(self.encoding) + b'\n'
-        logger.debug("Sending the Command: [{}]".format(self.cmd))
-        self.subpro.stdin.write(self.cmd)
-        self.subpro.stdin.flush()
-        if self.cmd == b'Quit\n':
-            return self.check(True)
-        return self.check()
+        return self.doMany([cmd])[0][2]
+
+    def doMany(self, cmds):
+        """ Execute a list of commands in as few round-trips to s3270 as possible
+            The commands are written in windows of at most 'windowSize' bytes,
+            then the results of each window are read back in order, before the
+            next window is written. Returns a list of (buffer, statusMsg, result)
+            tuples, one per command.
+        """
+        encoded = self._encodedCommands
+        payloads = [encoded.get(cmd) or cmd.encode(self.encoding) + b'\n' for cmd in cmds]
+        results = []
+        with self._lock:
+            start = 0
+            while start < len(cmds):
+                # A window holds at least one command, whatever its size
+                end = start + 1
+                size = len(payloads[start])
+                while end < len(cmds) and size + len(payloads[end]) <= self.windowSize:
+                    size += len(payloads[end])
+                    end += 1
+                self.write(b''.join(payloads[start:end]))
+                for cmd in cmds[start:end]:
+                    result = self.check(cmd == 'Quit')
+                    results.append((self.buffer, self.statusMsg, result))
+                start = end
+        return results
+
+    def doRaw(self, data):
+        """ Execute a single command, already encoded and ended by a newline
+            The command should not be 'Quit', which has no result to check.
+        """
+        with self._lock:
+            self.write(data)
+            return self.check()
+
+    def write(self, payload):
+        """ Write encoded commands to s3270
+        """
+        logger.debug("Sending the Command: [%s]", payload)
+        written = os.write(self._stdinFd, payload)
+        while written < len(payload):
+            written += os.write(self._stdinFd, payload[written:])
+
+    async def doAsync(self, cmd):
+        """ Asynchronous version of 'do'
+            The exchange with s3270 runs in a worker thread, so the event loop is
+            free to do other work while waiting for the result. Concurrent calls
+            (e.g. gathered ones) are sent to s3270 in the order they are made.
+        """
+        results = await self.doManyAsync([cmd])
+        return results[0][2]
+
+    async def doManyAsync(self, cmds):
+        """ Asynchronous version of 'doMany'
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.doMany, cmds)
 
     def check(self, doNotCheck=False):
         """ Check the result of the executed command
@@ -53,41 +284,73 @@ class S3270():
         """
         if doNotCheck:
             return True
-        data = self.subpro.stdout.readline().decode(self.encoding).rstrip('\n').rstrip('\r')
-        if not data.startswith('data:'):
-            statusMsg = data
-        else:
-            self.buffer = data[6:]
-            data = self.subpro.stdout.readline().decode(self.encoding).rstrip('\n').rstrip('\r')
-            if not data.startswith('data:'):
-                statusMsg = data
-            else:
-                self.buffer += '\n' + data[6:]
-                go = True
-                while go:
-                    data = self.subpro.stdout.readline().decode(self.encoding).rstrip('\n').rstrip('\r')
-                    if not data.startswith('data:'):
-                        go = False
-                        statusMsg = data
-                    else:
-                        self.buffer += '\n' + data[6:]
-
-        returnMsg = self.subpro.stdout.readline().decode(self.encoding).rstrip('\n').rstrip('\r')
+        # Lines are split and stripped as bytes: only \n and \r end a line,
+        # whatever the encoding, and only the parts in use get decoded
+        lines = self.readReply().splitlines()
+        data = [line[6:] for line in lines if line.startswith(b'data:')]
+        if data:
+            self.buffer = b'\n'.join(data).decode(self.encoding)
+        statusMsg, returnMsg = (lines[len(data):] + [b'', b''])[:2]
+        statusMsg = statusMsg.decode(self.encoding)
         self.statusMsg = StatusMessage(statusMsg)
-        logger.debug("Buffer data    => [{}]".format(self.buffer))
-        logger.debug("Status message => [{}]".format(statusMsg))
-        logger.debug("Return message => [{}]".format(returnMsg))
-        if returnMsg == 'ok':
+        self.lastConnectionState = self.statusMsg.connectionState()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Buffer data    => [%s]", self.buffer)
+            logger.debug("Status message => [%s]", statusMsg)
+            logger.debug("Return message => [%s]", returnMsg.decode(self.encoding))
+        # The return message is ASCII, it is checked without decoding it
+        if returnMsg == b'ok':
             return True
         return False
 
+    def readReply(self):
+        """ Read the raw bytes of one reply, up to and including its return message
+            The output is read in bulk; whatever follows the reply (the replies
+            of the next commands of a batch) is kept for the next call.
+            At end of file, whatever was read is returned.
+        """
+        pending = self._pending
+        start = 0
+        while True:
+            end = self.returnPattern.search(pending, start)
+            if end:
+                reply = bytes(pending[:end.end()])
+                del pending[:end.end()]
+                return reply
+            # Only the last (incomplete) line needs to be scanned again
+            start = pending.rfind(b'\n') + 1
+            chunk = self.subpro.stdout.read1(65536)
+            if not chunk:
+                reply = bytes(pending)
+                del pending[:]
+                return reply
+            pending += chunk
+
+
+atexit.register(S3270.closeIdle)
+
 
 class P3270Client():
     """ P3270Client: Represents the model of a 3270 client.
         It may rely on a configuration file for further customization. If no
         configuration file is specified. Default values will be used.
     """
+    __slots__ = ('luName', 'hostName', 'hostPort', 'modelName', 'configFile', 'verifyCert', 'enableTLS',
+                 'timeout', 'path', 'conf', 'subpro', 'args', 's3270', '_defaultDimensions',
+                 '_connectCmd', '_isValid')
     numOfInstances = 0
+    # Screen definition (rows, cols) of each model
+    _modelDimensions = {'3278-2': (24, 80), '3279-2': (24, 80),
+                        '3278-3': (32, 80), '3279-3': (32, 80),
+                        '3278-4': (43, 80), '3279-4': (43, 80),
+                        '3278-5': (27, 132), '3279-5': (27, 132)}
+    # Pre-encoded constant commands (shared with S3270), sent with S3270.doRaw
+    _commands = S3270._encodedCommands
+    # PF and PA key commands, by key number
+    _pfCommands = tuple(S3270._encodedCommands.get('PF({})'.format(n)) for n in range(25))
+    _paCommands = tuple(S3270._encodedCommands.get('PA({})'.format(n)) for n in range(4))
+    # Commands for the special keys of sendKeys
+    _keyCommands = {'\n': 'Enter', '\t': 'Tab', '\b': 'BackSpace'}
 
     def __init__(self, luName=None, hostName='localhost', hostPort='23', modelName='3279-2', configFile=None,
                  verifyCert='yes', enableTLS='no', codePage='cp037', path=None, timeoutInSec=20):
@@ -105,7 +368,15 @@ class P3270Client():
         if self.conf.isValid():
             self.subpro = None
             self.makeArgs()
-            self.s3270 = S3270(self.args, self.conf.encoding)
+            # Reuse the s3270 process of an ended session if one is available
+            self.s3270 = S3270.acquire(self.args, self.conf.encoding)
+            self._defaultDimensions = self._modelDimensions[self.conf.modelName]
+            # The 'L:' prefix connects through a TLS tunnel
+            prefix = 'L' if self.conf.enableTLS == 'yes' else 'B'
+            if self.conf.luName:
+                self._connectCmd = 'Connect({}:{}@{})'.format(prefix, self.conf.luName, self.conf.hostName)
+            else:
+                self._connectCmd = 'Connect({}:{})'.format(prefix, self.conf.hostName)
         else:
             raise InvalidConfiguration
         self._isValid = self.conf.isValid()
@@ -137,33 +408,38 @@ class P3270Client():
         """ Connect to the host
         """
         if self.conf.luName:
-            logger.info("Connect to host [{}] with LUName: [{}]".format(self.conf.hostName, self.conf.luName))
-            if self.conf.enableTLS == 'yes':
-                return self.s3270.do('Connect(L:{}@{})'.format(self.conf.luName, self.conf.hostName))
-            return self.s3270.do('Connect(B:{}@{})'.format(self.conf.luName, self.conf.hostName))
+            logger.info("Connect to host [%s] with LUName: [%s]", self.conf.hostName, self.conf.luName)
         else:
-            logger.info("Connect to host [{}] with no LUName".format(self.conf.hostName))
-            if self.conf.enableTLS == 'yes':
-                return self.s3270.do('Connect(L:{})'.format(self.conf.hostName))
-            return self.s3270.do('Connect(B:{})'.format(self.conf.hostName))
+            logger.info("Connect to host [%s] with no LUName", self.conf.hostName)
+        return self.s3270.do(self._connectCmd)
 
     def disconnect(self):
         """ Disconnect from host
         """
-        logger.info("Disconnect from host ({})".format(self.hostName))
-        return self.s3270.do('Disconnect')
+        logger.info("Disconnect from host (%s)", self.hostName)
+        return self.s3270.doRaw(self._commands['Disconnect'])
 
     def endSession(self):
-        """ End the emulator script
+        """ End the emulator session
+            The client is disconnected and its s3270 process is kept, so that
+            the next client created with the same settings can reuse it.
+            If the disconnection fails, the emulator script is ended instead.
+            The client is detached from its s3270 process: it cannot be used afterwards.
         """
+        if self.s3270 is None:
+            logger.warning("The session is already ended")
+            return True
         logger.info("Ending the session")
-        return self.s3270.do('Quit')
+        s3270, self.s3270 = self.s3270, None
+        if not s3270.doRaw(self._commands['Disconnect']):
+            return s3270.do('Quit')
+        return s3270.release()
 
     def sendEnter(self):
         """ Send Enter to host
         """
         logger.info("Sending Enter key")
-        return self.s3270.do('Enter')
+        return self.s3270.doRaw(self._commands['Enter'])
 
     def sendPF(self, n):
         """ Send a PF (Program Function) key to the remote host.
@@ -171,10 +447,10 @@ class P3270Client():
             n in 1..24
         """
         if isinstance(n, int) and n >= 1 and n <= 24:
-            logger.info("Sending PF key {} to remote host".format(n))
-            return self.s3270.do('PF({})'.format(n))
+            logger.info("Sending PF key %s to remote host", n)
+            return self.s3270.doRaw(self._pfCommands[n])
         else:
-            logger.error("Specified PF key ({}) out of the range 1..24, or not int".format(n))
+            logger.error("Specified PF key (%s) out of the range 1..24, or not int", n)
             return False
 
     def sendPA(self, n):
@@ -183,107 +459,101 @@ class P3270Client():
             n in 1..3
         """
         if isinstance(n, int) and n >= 1 and n <= 3:
-            logger.info("Sending PA key {} to remote host".format(n))
-            return self.s3270.do('PA({})'.format(n))
+            logger.info("Sending PA key %s to remote host", n)
+            return self.s3270.doRaw(self._paCommands[n])
         else:
-            logger.error("Specified PA key({})out of the range 1..3, or not int".format(n))
+            logger.error("Specified PA key(%s)out of the range 1..3, or not int", n)
             return False
 
     def sendBackSpace(self):
         """ Send ASCII BS or move cursor to the left
         """
         logger.info("Sending back space to remote host")
-        return self.s3270.do('BackSpace')
+        return self.s3270.doRaw(self._commands['BackSpace'])
 
     def sendBackTab(self):
         """ Send back tab (to go to the beginning previous field).
         """
         logger.info("Sending back tab to remote host")
-        return self.s3270.do('BackTab')
+        return self.s3270.doRaw(self._commands['BackTab'])
 
     def sendHome(self):
         """ Send Home key
         """
         logger.info("Sending Home key to remote host")
-        return self.s3270.do('Home')
+        return self.s3270.doRaw(self._commands['Home'])
 
     def sendTab(self):
         """ Send tab key (to go to the beginnig of the next field).
         """
         logger.info("Sending tab to remote host")
-        return self.s3270.do('Tab')
+        return self.s3270.doRaw(self._commands['Tab'])
 
     def sendKeys(self, keys):
         """ Send a string of keys to the remote host.
             Emulates pressing a key on the 3270 keyboard.
             May block waiting for a response
-            keys is a string of keys to send
+            keys is a string of keys to send, of any length. They are sent in batches
+            (see S3270.doMany), and the result is True if every key succeeded.
         """
-        logger.info("Sending keys [{}] to remote host".format(keys))
-        for key in keys:
-            if key == '\n':
-                return self.sendEnter()
-            if key == '\t':
-                return self.sendTab()
-            if key == '\b':
-                return self.sendBackSpace()
-
-            return self.s3270.do("Key({})".format(key))
+        logger.info("Sending keys [%s] to remote host", keys)
+        cmds = [self._keyCommands.get(key) or "Key({})".format(key) for key in keys]
+        return all(result for buffer, statusMsg, result in self.s3270.doMany(cmds))
 
     def clearScreen(self):
         """ Clear the screen.
             May block waiting for a response
         """
         logger.info("Clear screen")
-        return self.s3270.do('Clear')
+        return self.s3270.doRaw(self._commands['Clear'])
 
     def delChar(self):
         """ Delete character under cursor
         """
         logger.info("Deleting char")
-        return self.s3270.do('Delete')
+        return self.s3270.doRaw(self._commands['Delete'])
 
     def delField(self):
         """ Delete entire field.
         """
         logger.info("Deleting field")
-        return self.s3270.do('DeleteField')
+        return self.s3270.doRaw(self._commands['DeleteField'])
 
     def delWord(self):
         """ Delete word under cursor.
         """
         logger.info("Deleting word")
-        return self.s3270.do('DeleteWord')
+        return self.s3270.doRaw(self._commands['DeleteWord'])
 
     def eraseChar(self):
         """ Erase previous character (or send ASCII BS).
         """
         logger.info("Erase character")
-        return self.s3270.do('Erase')
+        return self.s3270.doRaw(self._commands['Erase'])
 
     def moveCursorDown(self):
         """ Move cursor Down.
         """
         logger.info("Move cursor Down")
-        return self.s3270.do('Down')
+        return self.s3270.doRaw(self._commands['Down'])
 
     def moveCursorUp(self):
         """ Move cursor Up.
         """
         logger.info("Move cursor Up")
-        return self.s3270.do('Up')
+        return self.s3270.doRaw(self._commands['Up'])
 
     def moveCursorLeft(self):
         """ Move cursor left.
         """
         logger.info("Move cursor left")
-        return self.s3270.do('Left')
+        return self.s3270.doRaw(self._commands['Left'])
 
     def moveCursorRight(self):
         """ Move cursor right.
         """
         logger.info("Move cursor right")
-        return self.s3270.do('Right')
+        return self.s3270.doRaw(self._commands['Right'])
 
     def moveTo(self, row, col):
         """ Move cursor to the position specified by (row,col) pair.
@@ -291,19 +561,19 @@ class P3270Client():
         # The origin is [0,0] not [1,1]
         row -= 1
         col -= 1
-        logger.info("Move cursor to the position ({},{})".format(row, col))
+        logger.info("Move cursor to the position (%s,%s)", row, col)
         return self.s3270.do('MoveCursor({}, {})'.format(row, col))
 
     def moveToFirstInputField(self):
         """ Move cursor to the first input field.
         """
         logger.info("Move cursor to the first input field")
-        return self.s3270.do('Home')
+        return self.s3270.doRaw(self._commands['Home'])
 
     def sendText(self, text, asterisks=False):
         """ Send text to host. Possible to hide value (asterisk it) in log by set asterisks to True.
         """
-        logger.info("Send the following text: [{}]".format('*' * len(text) if asterisks else text))
+        logger.info("Send the following text: [%s]", '*' * len(text) if asterisks else text)
         return self.s3270.do('String("{}")'.format(text))
 
     def saveScreen(self, fileName='screen', dataType='html'):
@@ -313,13 +583,13 @@ class P3270Client():
         if fileName and self.conf.screensDir:
             fileName = os.path.join(self.conf.screensDir, fileName)
         if dataType == 'html' or dataType == 'rtf':
-            logger.info("Save an '{}' screen to file [{}]".format(dataType, fileName))
+            logger.info("Save an '%s' screen to file [%s]", dataType, fileName)
             return self.s3270.do('PrintText({}, {})'.format(dataType, fileName))
         if dataType == 'txt':
-            logger.info("Save an '{}' screen to file [{}]".format(dataType, fileName))
+            logger.info("Save an '%s' screen to file [%s]", dataType, fileName)
             return self.s3270.do('PrintText(file, {})'.format(fileName))
         else:
-            logger.error("Specified data type '{}' is invalid".format(dataType))
+            logger.error("Specified data type '%s' is invalid", dataType)
             return False
 
     def getScreen(self):
@@ -333,27 +603,24 @@ class P3270Client():
         """ Print the current screen to stdout
         """
         screen = self.getScreen()
-        if self.s3270.statusMsg.screenDefinition():
-            rows, cols = self.s3270.statusMsg.screenDefinition()
-        else:
-            if self.conf.modelName == '3278-2' or self.conf.modelName == '3279-2':
-                cols, rows = 80, 24
-            elif self.conf.modelName == '3278-3' or self.conf.modelName == '3279-3':
-                cols, rows = 80, 32
-            elif self.conf.modelName == '3278-4' or self.conf.modelName == '3279-4':
-                cols, rows = 80, 43
-            elif self.conf.modelName == '3278-5' or self.conf.modelName == '3279-5':
-                cols, rows = 132, 27
+        rows, cols = self.s3270.statusMsg.screenDefinition() or self._defaultDimensions
         print('*' * cols)
         print(screen)
         print('*' * cols)
 
     def isConnected(self):
-        """ Get the connection status.
+        """ Get the connection status, as of the last command sent to the host.
+            No command is sent: use 'refreshStatus' to query s3270 first.
             returns 'True' if connected, 'False' otherwise
         """
-        self.s3270.do('NoOpCommand')
-        return self.s3270.statusMsg.connectionState()
+        return self.s3270.lastConnectionState
+
+    def refreshStatus(self):
+        """ Query s3270 for a fresh status message.
+            returns the connection status, as 'isConnected'
+        """
+        self.s3270.doRaw(self._commands['NoOpCommand'])
+        return self.s3270.lastConnectionState
 
     def readTextAtPosition(self, row, col, length):
         """ Reads text at a row,col position and returns it
@@ -361,12 +628,14 @@ class P3270Client():
         # The origin is [0,0] not [1,1]
         row -= 1
         col -= 1
-        logger.info("Reading at position ({},{})".format(row, col))
+        logger.info("Reading at position (%s,%s)", row, col)
         self.s3270.do("Ascii({0},{1},{2})".format(row, col, length))
         return self.s3270.buffer
 
-    def readTextArea(self, row, col, rows, cols):
+    def readTextArea(self, row, col, rows, cols, raw=False):
         """ Reads a textarea at a row,col position going down a number of rows and reading a number of cols
+            The rows are returned as a list, unless raw is True: the text is then
+            returned as is, with the rows separated by newlines.
         """
         # The origin is [0,0] not [1,1]
 
@@ -375,10 +644,10 @@ class P3270Client():
         
         row -= 1
         col -= 1
-        logger.info("Reading area at ({},{}) with rows: {} and cols: {}".format(row, col, rows, cols))
+        logger.info("Reading area at (%s,%s) with rows: %s and cols: %s", row, col, rows, cols)
         self.s3270.do("Ascii({0},{1},{2},{3})".format(row, col, rows, cols))
         result = self.s3270.buffer
-        if rows > 1:
+        if rows > 1 and not raw:
             return result.splitlines()
 
         return result
@@ -389,11 +658,20 @@ class P3270Client():
 
 
     def trySendTextToField(self, text, row, col) -> bool:
-        self.moveTo(row, col)
-        self.delField()
-        self.sendText(text)
-        result = self.readTextAtPosition(row,col,len(text))
-        return text == result
+        """ Move to the field at (row,col), clear it and type the text in.
+            Returns True if the text is then read back at that position.
+            All the actions are sent to s3270 in a single round-trip.
+        """
+        # The origin is [0,0] not [1,1]
+        row -= 1
+        col -= 1
+        logger.info("Send the text [%s] to the field at position (%s,%s)", text, row, col)
+        results = self.s3270.doMany(['MoveCursor({}, {})'.format(row, col),
+                                     'DeleteField',
+                                     'String("{}")'.format(text),
+                                     'Ascii({0},{1},{2})'.format(row, col, len(text))])
+        buffer, statusMsg, result = results[-1]
+        return result and buffer == text
 
     def waitFor3270Mode(self):
         """Wait until the emulator is in 3270 mode.
@@ -519,8 +797,8 @@ class Config():
                        # 'bracket': 'oldibm, bracket437'
                        }
 
-    _validModels = ['3278-2', '3278-3', '3278-4', '3278-5',
-                    '3279-2', '3279-3', '3279-4', '3279-5']
+    _validModels = frozenset(['3278-2', '3278-3', '3278-4', '3278-5',
+                              '3279-2', '3279-3', '3279-4', '3279-5'])
     _sbcsCodePages = {'cp037': '(cp37, us, us-intl)',
                       'cp273': '(german)',
                       'cp275': '(brazilian)',
@@ -561,17 +839,24 @@ class Config():
                      'cp935': '(cp936, simplified-chinese)',
                      'cp937': '(traditional-chinese)',
                      'cp1388': '(chinese-gb18030)'}
+    _validCodePages = frozenset(_sbcsCodePages) | frozenset(_dbcsCodePage)
     commentPattern = re.compile("^#.*$")
     emptyLinePattern = re.compile("^ *$")
-    hostPattern = re.compile("^ *hostname *=")
-    portPattern = re.compile("^ *port *=")
-    modelPattern = re.compile("^ *model *=")
-    traceFilePattern = re.compile("^ *traceFile *=")
-    luPattern = re.compile("^ *LUName *=")
-    cpPattern = re.compile("^ *codePage *=")
-    screensPattern = re.compile("^ *screensDir *=")
-    verifyCertPattern = re.compile("^ *verifyCert *=")
-    enableTLSPattern = re.compile("^ *enableTLS *=")
+    parameterPattern = re.compile(r"^\s*([A-Za-z]+)\s*=\s*(.*?)\s*$")
+    # Configuration file parameters (lower-cased) and the attributes they set
+    _parameterAttributes = {'hostname': 'hostName',
+                            'port': 'hostPort',
+                            'model': 'modelName',
+                            'tracefile': 'traceFile',
+                            'luname': 'luName',
+                            'codepage': 'codePage',
+                            'screensdir': 'screensDir',
+                            'verifycert': 'verifyCert',
+                            'enabletls': 'enableTLS'}
+    # Parameters whose value is case insensitive (yes/no)
+    _lowerCaseParameters = ('verifycert', 'enabletls')
+    # Characters removed from the configuration lines (split on '\n')
+    _stripTable = str.maketrans('', '', '\r\t')
 
     def __init__(self, cfgFile=None, hostName='localhost', hostPort='23',
                  modelName='3279-2', traceFile=None,
@@ -595,13 +880,13 @@ class Config():
             self._isValid = False
             for attr in self.invalidAttributes:
                 if attr == 'modelName':
-                    logger.error("The model ({}) is not a valid model".format(self.modelName))
+                    logger.error("The model (%s) is not a valid model", self.modelName)
                 elif attr == 'hostPort':
-                    logger.error("Host port ({}) is out of range".format(self.hostPort))
+                    logger.error("Host port (%s) is not a number in the range 1..65535", self.hostPort)
                 elif attr == 'codePage':
-                    logger.error("The specified code page ({}) is not valid".format(self.codePage))
+                    logger.error("The specified code page (%s) is not valid", self.codePage)
                 elif attr == 'screensDir':
-                    logger.error("The directory ({}) does not exist".format(self.screensDir))
+                    logger.error("The directory (%s) does not exist", self.screensDir)
                 elif attr == 'verifyCert':
                     logger.error("The value of the verifyCert parameter in the config file should be: yes or no")
                 elif attr == 'enableTLS':
@@ -610,32 +895,23 @@ class Config():
             self._isValid = True
 
     def readConfig(self):
+        # Configuration files are small: they are read at once, and split in memory
         with open(self.cfgFile) as f:
-            for line in f:
-                line = line.replace('\n', '').replace('\r', '').replace('\t', '')
-                if self.hostPattern.match(line):
-                    self.hostName = line.split('=')[1].strip()
-                elif self.portPattern.match(line):
-                    self.hostPort = line.split('=')[1].strip()
-                elif self.modelPattern.match(line):
-                    self.modelName = line.split('=')[1].strip()
-                elif self.traceFilePattern.match(line):
-                    self.traceFile = line.split('=')[1].strip()
-                elif self.luPattern.match(line):
-                    self.luName = line.split('=')[1].strip()
-                elif self.cpPattern.match(line):
-                    self.codePage = line.split('=')[1].strip()
-                elif self.screensPattern.match(line):
-                    self.screensDir = line.split('=')[1].strip()
-                elif self.verifyCertPattern.match(line):
-                    self.verifyCert = line.split('=')[1].strip().lower()
-                elif self.enableTLSPattern.match(line):
-                    self.enableTLS = line.split('=')[1].strip().lower()
+            lines = f.read().translate(self._stripTable).split('\n')
+        for line in lines:
+            match = self.parameterPattern.match(line)
+            if match:
+                parameter, value = match.group(1).lower(), match.group(2)
+                attribute = self._parameterAttributes.get(parameter)
+                if attribute:
+                    if parameter in self._lowerCaseParameters:
+                        value = value.lower()
+                    setattr(self, attribute, value)
 
     def validateAttributes(self):
         """ Validate configuration attributes:
             Model name: 3278-x or 3279-x (x in 2 .. 5)
-            Port: should be in the range 1..65535
+            Port: should be a number in the range 1..65535
             codePage: The specified code page should be valid
             screensDir: The directory should exist if specified
             verifyCert: The value should be "yes" or "no"
@@ -643,10 +919,13 @@ class Config():
         """
         if self.modelName not in self._validModels:
             self.invalidAttributes.append('modelName')
-        if int(self.hostPort) < 1 or int(self.hostPort) > 65535:
+        try:
+            if not 1 <= int(self.hostPort) <= 65535:
+                self.invalidAttributes.append('hostPort')
+        except ValueError:
             self.invalidAttributes.append('hostPort')
         if self.codePage:
-            if self.codePage not in self._dbcsCodePage and self.codePage not in self._sbcsCodePages:
+            if self.codePage not in self._validCodePages:
                 self.invalidAttributes.append('codePage')
             else:
                 self.encoding = self._encodingLookup.get(self.codePage, 'latin1')
@@ -675,26 +954,46 @@ class Config():
 
 
 class StatusMessage():
+    __slots__ = ('statusMessage', 'keyboard', 'screen', 'field', 'connection', 'emulator', 'model',
+                 'numOfRows', 'numOfCols', 'cursorRow', 'cursorCol', 'winId', 'executionTime', '_is_valid',
+                 '_keyboardState', '_screenFormatting', '_fieldProtection', '_connectionState', '_emulatorMode')
+    _keyboardStates = {'U': 'Unlocked',
+                       'L': 'Locked',
+                       'E': 'Locked because of an operator error'}
+    _screenFormats = {'F': 'Formatted',
+                      'U': 'Unformatted'}
+    _fieldProtections = {'P': 'Protected',
+                         'U': 'Unprotected'}
+    _emulatorModes = {'I': '3270',
+                      'L': 'NVT Line',
+                      'C': 'NVT Character',
+                      'P': 'Unnegotiated',
+                      'N': 'Not connected'}
 
     def __init__(self, status):
         self.statusMessage = status
-        if not len(self.statusMessage.split(' ')) == 12:
+        fields = self.statusMessage.split(' ')
+        if not len(fields) == 12:
             self.statusMessage = ' ' * 12
             self._is_valid = False
+            self._keyboardState = self._screenFormatting = self._fieldProtection = None
+            self._connectionState = self._emulatorMode = None
         else:
-            self.keyboard = self.statusMessage.split(' ')[0]
-            self.screen = self.statusMessage.split(' ')[1]
-            self.field = self.statusMessage.split(' ')[2]
-            self.connection = self.statusMessage.split(' ')[3]
-            self.emulator = self.statusMessage.split(' ')[4]
-            self.model = self.statusMessage.split(' ')[5]
-            self.numOfRows = self.statusMessage.split(' ')[6]
-            self.numOfCols = self.statusMessage.split(' ')[7]
-            self.cursorRow = self.statusMessage.split(' ')[8]
-            self.cursorCol = self.statusMessage.split(' ')[9]
-            self.winId = self.statusMessage.split(' ')[10]
-            self.executionTime = self.statusMessage.split(' ')[11]
+            (self.keyboard, self.screen, self.field, self.connection,
+             self.emulator, self.model, self.numOfRows, self.numOfCols,
+             self.cursorRow, self.cursorCol, self.winId, self.executionTime) = fields
             self._is_valid = True
+            # The fields are translated once, the accessors just return them
+            self._keyboardState = self._keyboardStates.get(self.keyboard)
+            self._screenFormatting = self._screenFormats.get(self.screen)
+            self._fieldProtection = self._fieldProtections.get(self.field, 'Unknown')
+            if self.connection.startswith('C('):
+                self._connectionState = True
+            elif self.connection == 'N':
+                self._connectionState = False
+            else:
+                self._connectionState = None
+            self._emulatorMode = self._emulatorModes.get(self.emulator)
 
     def isValid(self):
         return self._is_valid
@@ -706,14 +1005,7 @@ class StatusMessage():
             'Locked because of an operator error'
             Returns None object if the message is invalid
         """
-        if self.isValid():
-            if self.keyboard == 'U':
-                return 'Unlocked'
-            elif self.keyboard == 'L':
-                return 'Locked'
-            elif self.keyboard == 'E':
-                return 'Locked because of an operator error'
-        return None
+        return self._keyboardState
 
     def screenFormatting(self):
         """ Returns a string:
@@ -721,12 +1013,7 @@ class StatusMessage():
             'Unformatted'
             Returns None object if the message is invalid
         """
-        if self.isValid():
-            if self.screen == 'F':
-                return 'Formatted'
-            elif self.screen == 'U':
-                return 'Unformatted'
-        return None
+        return self._screenFormatting
 
     def fieldProtection(self):
         """ Returns a string:
@@ -734,14 +1021,7 @@ class StatusMessage():
             'Unprotected'
             Returns None object if the message is invalid
         """
-        if self.isValid():
-            if self.field == 'P':
-                return 'Protected'
-            elif self.field == 'U':
-                return 'Unprotected'
-            else:
-                return 'Unknown'
-        return None
+        return self._fieldProtection
 
     def connectionState(self):
         """ Returns a boolean
@@ -749,12 +1029,7 @@ class StatusMessage():
             False: if not
             Returns None object if the message is invalid
         """
-        if self.isValid():
-            if self.connection.startswith('C('):
-                return True
-            elif self.connection == 'N':
-                return False
-        return None
+        return self._connectionState
 
     def emulatorMode(self):
         """ Returns a string:
@@ -765,18 +1040,7 @@ class StatusMessage():
             'Not connected':
             Returns None object if the message is invalid
         """
-        if self.isValid():
-            if self.emulator == 'I':
-                return '3270'
-            elif self.emulator == 'L':
-                return 'NVT Line'
-            elif self.emulator == 'C':
-                return 'NVT Character'
-            elif self.emulator == 'P':
-                return 'Unnegotiated'
-            elif self.emulator == 'N':
-                return 'Not connected'
-        return None
+        return self._emulatorMode
 
     def modelNumber(self):
         """ Return the client model number (2..5)
@@ -1,42 +1,125 @@
-from io import BytesIO, StringIO
+import asyncio
+from io import BytesIO
+import os
 import sys
+import tempfile
+import time
 import unittest
 from unittest.mock import Mock, patch
-from p3270 import P3270Client, S3270, InvalidConfiguration
+from p3270 import P3270Client, S3270, InvalidConfiguration, enableFileLogging, disableFileLogging
+
+# The reference screen is read once for the whole module
+with open('screen.data', 'r') as fData:
+    _screenData = fData.read().encode()
+with open('screen.txt', 'r') as fText:
+    _screenText = fText.read()
+_border = '*' * 80 + '\n'
+
+
+class FakePipes():
+    """ FakePipes: the stdin and stdout pipes of an s3270 process, with a limited capacity
+        Like s3270, a command is only read when its reply fits in the stdout pipe:
+        a write which cannot progress would block forever, it fails instead.
+    """
+
+    def __init__(self, reply, capacity=65536):
+        self.reply = reply
+        self.capacity = capacity
+        self.stdin = bytearray()
+        self.stdout = bytearray()
+
+    def process(self):
+        while b'\n' in self.stdin and len(self.stdout) + len(self.reply) <= self.capacity:
+            del self.stdin[:self.stdin.index(b'\n') + 1]
+            self.stdout += self.reply
+
+    def write(self, fd, data):
+        self.process()
+        written = min(len(data), self.capacity - len(self.stdin))
+        if not written:
+            raise AssertionError('Blocked writing to s3270: its replies are not read')
+        self.stdin += data[:written]
+        return written
+
+    def read1(self, size):
+        self.process()
+        chunk = bytes(self.stdout[:size])
+        del self.stdout[:size]
+        return chunk
+
 
 
 class TestP3270Client(unittest.TestCase):
+    # Raw s3270 replies
+    invalidConnectReply = (b'data: Connect to localhost, port 58001: Connection refused\n'
+                           b'L U U N N 2 24 80 0 0 0x0 -\n'
+                           b'error')
+    validReply = (b'U F U C(localhost) I 2 24 80 8 2 0x0 0.000\n'
+                  b'ok')
+    invalidReply = b'\n'
+    disconnectedReply = (b'data: Unknown action: NoOpCommand\n'
+                         b'L U U N N 2 24 80 0 0 0x0 -\n'
+                         b'error')
+
+    # Methods sending a single command without argument
+    simpleCommands = (('sendEnter', b'Enter\n'),
+                      ('sendBackSpace', b'BackSpace\n'),
+                      ('sendBackTab', b'BackTab\n'),
+                      ('sendTab', b'Tab\n'),
+                      ('clearScreen', b'Clear\n'),
+                      ('delChar', b'Delete\n'),
+                      ('delField', b'DeleteField\n'),
+                      ('eraseChar', b'Erase\n'),
+                      ('moveCursorDown', b'Down\n'),
+                      ('moveCursorUp', b'Up\n'),
+                      ('moveCursorLeft', b'Left\n'),
+                      ('moveCursorRight', b'Right\n'),
+                      ('moveToFirstInputField', b'Home\n'))
+
+    # Arguments with no matching PF/PA key
+    invalidKeyArgs = (('sendPF', 37), ('sendPF', 'q'), ('sendPF', -3),
+                      ('sendPA', 5), ('sendPA', 'b'), ('sendPA', -3))
+
+    @classmethod
+    def setUpClass(cls):
+        cls.popenPatcher = patch('subprocess.Popen')
+        cls.popenMock = cls.popenPatcher.start()
+        # Not a valid descriptor, the pipe size cannot be changed
+        cls.popenMock.return_value.stdout.fileno.return_value = -1
+        cls.writePatcher = patch('os.write')
+        cls.writeMock = cls.writePatcher.start()
+        # Resetting the Popen mock also resets the writes to its stdin
+        cls.popenMock.attach_mock(cls.writeMock, 'write')
+        cls.client1 = P3270Client(configFile="p3270_ok.cfg")
+        cls.client3 = P3270Client(configFile="p3270_tls_ok.cfg")
+        cls.screensDir = cls.client1.conf.screensDir
+        cls.screenData = _screenData
+        cls.screenText = _border + _screenText + _border
+        cls.validReplyWithData = b''.join((cls.screenData, cls.validReply))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.writePatcher.stop()
+        cls.popenPatcher.stop()
 
     def setUp(self):
-        self.invalidConnectResponse = BytesIO(b'data: Connect to localhost, port 58001: Connection refused\n'
-                                              + b'L U U N N 2 24 80 0 0 0x0 -\n'
-                                              + b'error')
-        self.validResponse = BytesIO(b'U F U C(localhost) I 2 24 80 8 2 0x0 0.000\n'
-                                     + b'ok')
-        self.invalidResponse = BytesIO(b'\n'
-                                       + b'')
-        self.disconnectedResponse = BytesIO(b'data: Unknown action: NoOpCommand\n'
-                                            + b'L U U N N 2 24 80 0 0 0x0 -\n'
-                                            + b'error')
-        self.popenPatcher = patch('subprocess.Popen')
-        self.popenMock = self.popenPatcher.start()
-        self.client1 = P3270Client(configFile="p3270_ok.cfg")
-        self.client3 = P3270Client(configFile="p3270_tls_ok.cfg")
-        with open('screen.data', 'r') as fData:
-            self.screenData = fData.read().encode()
-        with open('screen.txt', 'r') as fText:
-            self.screenText = '*' * 80 + '\n'
-            self.screenText += fText.read()
-            self.screenText += '*' * 80 + '\n'
-        self.validResponseWithData = BytesIO(self.screenData
-                                             + b'U F U C(localhost) I 2 24 80 8 2 0x0 0.000\n'
-                                             + b'ok')
+        # The mocks are shared by all the tests: only their state is reset
+        self.popenMock.reset_mock()
+        # The s3270 process is running
+        self.popenMock.return_value.poll.return_value = None
+        self.writeMock.side_effect = lambda fd, data: len(data)
+        # Responses are consumed by the tests
+        self.invalidConnectResponse = BytesIO(self.invalidConnectReply)
+        self.validResponse = BytesIO(self.validReply)
+        self.invalidResponse = BytesIO(self.invalidReply)
+        self.disconnectedResponse = BytesIO(self.disconnectedReply)
+        self.validResponseWithData = BytesIO(self.validReplyWithData)
 
     def tearDown(self):
-        self.popenPatcher.stop()
+        S3270._pool.clear()
 
     def checkStdin(self, cmd):
-        self.popenMock.return_value.stdin.write.assert_called_once_with(cmd)
+        self.writeMock.assert_called_with(self.popenMock.return_value.stdin.fileno(), cmd)
 
     def resetMock(self):
         self.popenMock.reset_mock()
@@ -47,6 +130,56 @@ class TestP3270Client(unittest.TestCase):
         with self.assertRaises(InvalidConfiguration):
             self.client2 = P3270Client(configFile="p3270_ko.cfg")
 
+    def test_invalidPort(self):
+        with self.assertRaises(InvalidConfiguration):
+            P3270Client(hostPort='telnet')
+        with self.assertRaises(InvalidConfiguration):
+            P3270Client(hostPort='65536')
+
+    def test_readConfig(self):
+        conf = self.client3.conf
+        assert conf.hostName == 'localhost'
+        assert conf.hostPort == '58001'
+        assert conf.modelName == '3279-2'
+        assert conf.traceFile == 'cics_py.trace'
+        assert conf.luName == 'LU01QSWJ'
+        assert conf.codePage == 'cp037'
+        assert conf.screensDir == '.'
+        assert conf.verifyCert == 'no'
+        assert conf.enableTLS == 'yes'
+
+    def test_enableFileLogging(self):
+        with tempfile.TemporaryDirectory() as logDir:
+            logFile = os.path.join(logDir, 'p3270.log')
+            enableFileLogging(logFile)
+            try:
+                self.resetMock()
+                self.client1.sendEnter()
+            finally:
+                disableFileLogging()
+            with open(logFile) as f:
+                log = f.read()
+        assert 'INFO: ' in log and 'Sending Enter key' in log
+        # Debug messages are below the default level
+        assert 'Sending the Command' not in log
+
+    def test_fileLoggingFlushed(self):
+        # The records are on disk once written, without waiting for the end
+        with tempfile.TemporaryDirectory() as logDir:
+            logFile = os.path.join(logDir, 'p3270.log')
+            enableFileLogging(logFile)
+            try:
+                self.resetMock()
+                self.client1.sendEnter()
+                deadline = time.monotonic() + 5
+                while not os.path.getsize(logFile) and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                with open(logFile) as f:
+                    log = f.read()
+            finally:
+                disableFileLogging()
+        assert 'Sending Enter key' in log
+
     def test_connect_ok(self):
         cmd = b'Connect(B:LU01QSWJ@localhost)\n'
         self.resetMock()
@@ -59,6 +192,15 @@ class TestP3270Client(unittest.TestCase):
         assert self.client3.connect()
         self.checkStdin(cmd_tls)
 
+    def test_connect_noLUName(self):
+        cmd = b'Connect(B:myhost)\n'
+        client = P3270Client(hostName='myhost')
+        self.resetMock()
+        with self.assertLogs(level='INFO') as logs:
+            assert client.connect()
+        self.checkStdin(cmd)
+        assert 'Connect to host [myhost] with no LUName' in logs.output[0]
+
     def test_connect_ko(self):
         # Unsuccessful connection request
         self.popenMock.reset_mock()
@@ -67,7 +209,7 @@ class TestP3270Client(unittest.TestCase):
         # The following test fails on python 3.5 as in :
         #     https://github.com/rm-hull/luma.oled/issues/55
         # Anyway I am covering tests on writes on stdin in other cases
-        # self.popenMock.return_value.stdin.write.assert_called_once()
+        # self.writeMock.assert_called_once()
 
     def test_disconnect(self):
         cmd = b'Disconnect\n'
@@ -76,105 +218,137 @@ class TestP3270Client(unittest.TestCase):
         self.checkStdin(cmd)
 
     def test_endSession(self):
-        # End session quits the scripts. So there is no stdout to check
-        cmd = b'Quit\n'
-        self.popenMock.reset_mock()
-        self.client1.endSession()
-        self.checkStdin(cmd)
-
-    def test_sendEnter(self):
-        cmd = b'Enter\n'
-        self.resetMock()
-        assert self.client1.sendEnter()
-        self.checkStdin(cmd)
-
-    def test_sendPF(self):
-        cmd = b'PF(7)\n'
+        # End session disconnects and keeps the s3270 process for reuse
+        cmd = b'Disconnect\n'
+        client = P3270Client(configFile="p3270_ok.cfg")
+        s3270 = client.s3270
         self.resetMock()
-        assert self.client1.sendPF(7)
+        assert client.endSession()
         self.checkStdin(cmd)
-        self.popenMock.reset_mock()
-        assert not self.client1.sendPF(37)
-        assert not self.client1.sendPF('q')
-        assert not self.client1.sendPF(-3)
-        self.popenMock.return_value.stdin.write.assert_not_called()
+        assert client.s3270 is None
+        assert P3270Client(configFile="p3270_ok.cfg").s3270 is s3270
 
-    def test_sendPA(self):
-        cmd = b'PA(3)\n'
+    def test_endSessionTwice(self):
+        # A process is never pooled twice, nor handed out to two clients
+        client = P3270Client(configFile="p3270_ok.cfg")
+        s3270 = client.s3270
         self.resetMock()
-        assert self.client1.sendPA(3)
-        self.checkStdin(cmd)
+        assert client.endSession()
         self.popenMock.reset_mock()
-        assert not self.client1.sendPA(5)
-        assert not self.client1.sendPA('b')
-        assert not self.client1.sendPA(-3)
-        self.popenMock.return_value.stdin.write.assert_not_called()
-
-    def test_sendBackSpace(self):
-        cmd = b'BackSpace\n'
+        assert client.endSession()
+        self.writeMock.assert_not_called()
+        assert not s3270.release()
+        assert S3270._pool[tuple(client.args)] == [s3270]
+        client1 = P3270Client(configFile="p3270_ok.cfg")
+        client2 = P3270Client(configFile="p3270_ok.cfg")
+        assert client1.s3270 is not client2.s3270
+
+    def test_endSessionPoolFull(self):
+        # The script is ended when enough processes are already idle
+        client = P3270Client(configFile="p3270_ok.cfg")
         self.resetMock()
-        assert self.client1.sendBackSpace()
-        self.checkStdin(cmd)
-
-    def test_sendBackTab(self):
-        cmd = b'BackTab\n'
+        self.popenMock.return_value.stdout = BytesIO(b'L U U N N 2 24 80 0 0 0x0 -\nok\n')
+        with patch.object(S3270, 'maxIdle', 0):
+            assert client.endSession()
+        self.writeMock.assert_called_with(self.popenMock.return_value.stdin.fileno(), b'Quit\n')
+        assert not S3270._pool[tuple(client.args)]
+
+    def test_acquireEndedProcess(self):
+        # An idle process which has ended is not reused
+        client = P3270Client(configFile="p3270_ok.cfg")
+        s3270 = client.s3270
         self.resetMock()
-        assert self.client1.sendBackTab()
-        self.checkStdin(cmd)
+        assert client.endSession()
+        self.popenMock.return_value.poll.return_value = 0
+        assert P3270Client(configFile="p3270_ok.cfg").s3270 is not s3270
 
-    def test_sendTab(self):
-        cmd = b'Tab\n'
-        self.resetMock()
-        assert self.client1.sendTab()
-        self.checkStdin(cmd)
-
-    def test_clearScreen(self):
-        cmd = b'Clear\n'
-        self.resetMock()
-        assert self.client1.clearScreen()
-        self.checkStdin(cmd)
+    def test_endSessionDisconnectFailed(self):
+        # The script is ended when the disconnection fails
+        cmd = b'Quit\n'
+        client = P3270Client(configFile="p3270_ok.cfg")
+        self.popenMock.reset_mock()
+        self.popenMock.return_value.stdout = self.invalidResponse
+        assert client.endSession()
+        self.writeMock.assert_called_with(self.popenMock.return_value.stdin.fileno(), cmd)
+        assert not S3270._pool
 
-    def test_delChar(self):
-        cmd = b'Delete\n'
+    def test_closeIdle(self):
+        # The idle processes are ended and the pool is emptied
+        client = P3270Client(configFile="p3270_ok.cfg")
         self.resetMock()
-        assert self.client1.delChar()
-        self.checkStdin(cmd)
+        assert client.endSession()
+        self.popenMock.reset_mock()
+        S3270.closeIdle()
+        self.checkStdin(b'Quit\n')
+        assert not S3270._pool
+
+    def test_simpleCommands(self):
+        for name, cmd in self.simpleCommands:
+            with self.subTest(name=name):
+                # Each command consumes its own reply
+                self.popenMock.reset_mock()
+                self.popenMock.return_value.stdout = BytesIO(self.validReply)
+                assert getattr(self.client1, name)()
+                self.checkStdin(cmd)
+
+    def test_doManyLarge(self):
+        # The replies are read as the commands are written: the pipes never fill up
+        pipes = FakePipes(self.validReply + b'\n')
+        self.popenMock.reset_mock()
+        self.popenMock.return_value.stdout = pipes
+        self.writeMock.side_effect = pipes.write
+        results = self.client1.s3270.doMany(['Key(a)'] * 20000)
+        assert len(results) == 20000 and all(result for buffer, statusMsg, result in results)
+        assert not pipes.stdin and not pipes.stdout
 
-    def test_delField(self):
-        cmd = b'DeleteField\n'
+    def test_sendPF(self):
+        cmd = b'PF(7)\n'
         self.resetMock()
-        assert self.client1.delField()
+        assert self.client1.sendPF(7)
         self.checkStdin(cmd)
+        self.assertEqual(self.writeMock.call_count, 1)
 
-    def test_eraseChar(self):
-        cmd = b'Erase\n'
+    def test_sendPA(self):
+        cmd = b'PA(3)\n'
         self.resetMock()
-        assert self.client1.eraseChar()
+        assert self.client1.sendPA(3)
         self.checkStdin(cmd)
+        self.assertEqual(self.writeMock.call_count, 1)
 
-    def test_moveCursorDown(self):
-        cmd = b'Down\n'
-        self.resetMock()
-        assert self.client1.moveCursorDown()
-        self.checkStdin(cmd)
+    def test_invalidPFPAArgs(self):
+        # Nothing is sent for a key that does not exist
+        self.popenMock.reset_mock()
+        for name, arg in self.invalidKeyArgs:
+            with self.subTest(name=name, arg=arg):
+                assert not getattr(self.client1, name)(arg)
+        self.writeMock.assert_not_called()
 
-    def test_moveCursorUp(self):
-        cmd = b'Up\n'
+    def test_partialWrite(self):
+        # What the pipe did not take in the first write is written again
         self.resetMock()
-        assert self.client1.moveCursorUp()
-        self.checkStdin(cmd)
+        self.writeMock.side_effect = [2, 4]
+        assert self.client1.sendEnter()
+        stdinFd = self.popenMock.return_value.stdin.fileno()
+        self.writeMock.assert_any_call(stdinFd, b'Enter\n')
+        self.writeMock.assert_called_with(stdinFd, b'ter\n')
 
-    def test_moveCursorLeft(self):
-        cmd = b'Left\n'
-        self.resetMock()
-        assert self.client1.moveCursorLeft()
+    def test_sendKeys(self):
+        cmd = b'Key(a)\nTab\nKey(b)\nEnter\n'
+        self.popenMock.reset_mock()
+        self.popenMock.return_value.stdout = BytesIO(b'U F U C(localhost) I 2 24 80 8 2 0x0 0.000\nok\n' * 4)
+        assert self.client1.sendKeys('a\tb\n')
         self.checkStdin(cmd)
+        self.assertEqual(self.writeMock.call_count, 1)
 
-    def test_moveCursorRight(self):
-        cmd = b'Right\n'
-        self.resetMock()
-        assert self.client1.moveCursorRight()
-        self.checkStdin(cmd)
+    def test_sendKeysLong(self):
+        # A long string of keys does not fill up the pipes
+        pipes = FakePipes(self.validReply + b'\n')
+        self.popenMock.reset_mock()
+        self.popenMock.return_value.stdout = pipes
+        self.writeMock.side_effect = pipes.write
+        assert self.client1.sendKeys('a' * 12000)
+        assert self.writeMock.call_count > 1
+        assert not pipes.stdin and not pipes.stdout
 
     def test_moveTo(self):
         cmd = b'MoveCursor(4, 19)\n'
@@ -189,12 +363,6 @@ class TestP3270Client(unittest.TestCase):
         assert self.client1.moveTo(-10, -10)
         self.checkStdin(cmd)
 
-    def test_moveToFirstInputField(self):
-        cmd = b'Home\n'
-        self.resetMock()
-        assert self.client1.moveToFirstInputField()
-        self.checkStdin(cmd)
-
     def test_sendText(self):
         cmd = b'String("CEMT I TASK")\n'
         self.resetMock()
@@ -213,16 +381,80 @@ class TestP3270Client(unittest.TestCase):
         assert self.client1.sendText('CEMT I TASK', asterisks=False)
         self.checkStdin(cmd)
 
+    def test_doAsync(self):
+        cmd = b'Enter\n'
+        self.resetMock()
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(self.client1.s3270.doAsync('Enter'))
+        finally:
+            loop.close()
+        self.checkStdin(cmd)
+
+    def test_doAsyncOrder(self):
+        # Gathered calls are sent in the order they are made
+        keys = ['Key({})'.format(n) for n in range(30)]
+        self.popenMock.reset_mock()
+        self.popenMock.return_value.stdout = BytesIO((self.validReply + b'\n') * 30)
+
+        def slowWrite(fd, data):
+            # Long enough for the calls to overlap
+            time.sleep(0.001)
+            return len(data)
+
+        self.writeMock.side_effect = slowWrite
+
+        async def sendAll():
+            return await asyncio.gather(*(self.client1.s3270.doAsync(key) for key in keys))
+
+        loop = asyncio.new_event_loop()
+        try:
+            assert all(loop.run_until_complete(sendAll()))
+        finally:
+            loop.close()
+        stdinFd = self.popenMock.return_value.stdin.fileno()
+        self.assertEqual(self.writeMock.call_args_list,
+                         [((stdinFd, '{}\n'.format(key).encode()),) for key in keys])
+
+    def test_trySendTextToField(self):
+        cmd = (b'MoveCursor(4, 19)\n'
+               + b'DeleteField\n'
+               + b'String("CEMT")\n'
+               + b'Ascii(4,19,4)\n')
+        self.popenMock.reset_mock()
+        self.popenMock.return_value.stdout = BytesIO(b'U F U C(localhost) I 2 24 80 4 19 0x0 0.000\nok\n' * 3
+                                                     + b'data: CEMT\n'
+                                                     + b'U F U C(localhost) I 2 24 80 4 23 0x0 0.000\nok\n')
+        assert self.client1.trySendTextToField('CEMT', 5, 20)
+        self.checkStdin(cmd)
+        self.assertEqual(self.writeMock.call_count, 1)
+
+    def test_readTextArea(self):
+        cmd = b'Ascii(1,2,2,4)\n'
+        self.popenMock.reset_mock()
+        self.popenMock.return_value.stdout = BytesIO(b'data: CEMT\n'
+                                                     + b'data: TASK\n'
+                                                     + b'U F U C(localhost) I 2 24 80 8 2 0x0 0.000\n'
+                                                     + b'ok')
+        self.assertEqual(self.client1.readTextArea(2, 3, 2, 4), ['CEMT', 'TASK'])
+        self.checkStdin(cmd)
+
+    def test_readTextAreaRaw(self):
+        self.popenMock.reset_mock()
+        self.popenMock.return_value.stdout = BytesIO(b'data: CEMT\n'
+                                                     + b'data: TASK\n'
+                                                     + b'U F U C(localhost) I 2 24 80 8 2 0x0 0.000\n'
+                                                     + b'ok')
+        self.assertEqual(self.client1.readTextArea(2, 3, 2, 4, raw=True), 'CEMT\nTASK')
+
     def test_saveScreenHTML(self):
-        screens_dir = self.client1.conf.screensDir
-        cmd = b'PrintText(html, {}/myscreen.html)\n'.decode().format(screens_dir).encode()
+        cmd = 'PrintText(html, {}/myscreen.html)\n'.format(self.screensDir).encode()
         self.resetMock()
         assert self.client1.saveScreen('myscreen.html')
         self.checkStdin(cmd)
 
     def test_saveScreenRTF(self):
-        screens_dir = self.client1.conf.screensDir
-        cmd = b'PrintText(rtf, {}/myscreen.rtf)\n'.decode().format(screens_dir).encode()
+        cmd = 'PrintText(rtf, {}/myscreen.rtf)\n'.format(self.screensDir).encode()
         self.resetMock()
         assert self.client1.saveScreen('myscreen.rtf', 'rtf')
         self.checkStdin(cmd)
@@ -231,18 +463,30 @@ class TestP3270Client(unittest.TestCase):
         assert not self.client1.saveScreen('myscreen.pdf', 'pdf')
 
     def test_isConnected(self):
+        # The state of the last command is returned, nothing is sent
+        client = P3270Client(configFile="p3270_ok.cfg")
+        assert not client.isConnected()
+        self.resetMock()
+        client.sendEnter()
+        self.popenMock.reset_mock()
+        assert client.isConnected()
+        self.writeMock.assert_not_called()
+
+    def test_refreshStatus(self):
         self.resetMock()
         cmd = b'NoOpCommand\n'
-        assert self.client1.isConnected()
+        assert self.client1.refreshStatus()
         self.checkStdin(cmd)
+        assert self.client1.isConnected()
 
-    def test_isConnectedWhileNotConnected(self):
+    def test_refreshStatusWhileNotConnected(self):
         self.popenMock.reset_mock()
         self.popenMock.return_value.stdout = self.disconnectedResponse
         cmd = b'NoOpCommand\n'
-        assert not self.client1.isConnected()
+        assert not self.client1.refreshStatus()
         self.checkStdin(cmd)
         assert self.client1.s3270.buffer == 'Unknown action: NoOpCommand'
+        assert not self.client1.isConnected()
 
     def test_statusMessage(self):
         self.resetMock()
@@ -264,15 +508,16 @@ class TestP3270Client(unittest.TestCase):
         cmd = b'PrintText(string)\n'
         self.popenMock.reset_mock()
         self.popenMock.return_value.stdout = self.validResponseWithData
-        with patch('sys.stdout', new_callable=StringIO) as fakeStdout:
+        captured = []
+        with patch.object(sys.stdout, 'write', side_effect=captured.append):
             self.client1.printScreen()
-            self.checkStdin(cmd)
-            self.assertEqual(fakeStdout.getvalue(), self.screenText)
+        self.checkStdin(cmd)
+        self.assertEqual(''.join(captured), self.screenText)
 
     def test_invalidStatusMessage(self):
         self.popenMock.reset_mock()
         self.popenMock.return_value.stdout = self.invalidResponse
-        self.client1.isConnected()
+        self.client1.refreshStatus()
         statusMessage = self.client1.s3270.statusMsg
         assert not statusMessage.isValid()
         assert statusMessage.keyboardState() is None